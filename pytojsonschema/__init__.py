@@ -5,3 +5,5 @@ if sys.version_info.major != 3 or sys.version_info.minor < 8:  # pragma: no cove
     raise RuntimeError(
         f"Only Python 3.8 or higher is supported. Python {sys.version_info.major}.{sys.version_info.minor} was detected"
     )
+
+__version__ = "2.0.0"
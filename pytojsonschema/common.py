@@ -1,7 +1,18 @@
+from __future__ import annotations
+
 import ast
-import copy
+import contextlib
+import functools
+import hashlib
+import os
+import pathlib
+import pickle
+import sys
+import tempfile
 import typing
 
+from . import __version__
+
 BASE_SCHEMA_MAP = {
     "bool": {"type": "boolean"},
     "int": {"type": "integer"},
@@ -13,6 +24,8 @@ VALID_TYPING_TYPES = VALID_TYPING_AST_SUBSCRIPT_TYPES | frozenset({"TypedDict",
 VALID_ENUM_TYPES = frozenset({"Enum"})
 VALID_TYPES = VALID_TYPING_TYPES | VALID_ENUM_TYPES
 
+AST_CACHE_DIR_ENV_VAR = "PYTOJSONSCHEMA_CACHE_DIR"
+
 TypeNamespace = typing.Dict[str, typing.Set[str]]
 Schema = typing.Dict[str, typing.Any]
 SchemaMap = typing.Dict[str, Schema]
@@ -39,10 +52,11 @@ def init_schema_map() -> SchemaMap:
 
     :return: A SchemaMap object
     """
-    return copy.deepcopy(BASE_SCHEMA_MAP)
+    # Base schemas are flat dictionaries, so copying each of them is enough to isolate the new map
+    return {key: schema.copy() for key, schema in BASE_SCHEMA_MAP.items()}
 
 
-def get_ast_name_or_attribute_string(ast_element: typing.Union[ast.Name, ast.Attribute]) -> str:
+def get_ast_name_or_attribute_string(ast_element: ast.expr) -> str:
     """
     Get the string representation of an ast name or ast attribute element.
 
@@ -51,7 +65,84 @@ def get_ast_name_or_attribute_string(ast_element: typing.Union[ast.Name, ast.Att
     """
     if isinstance(ast_element, ast.Name):
         return ast_element.id
-    elif isinstance(ast_element.value, ast.Name):
+    elif isinstance(ast_element, ast.Attribute) and isinstance(ast_element.value, ast.Name):  # e.g. typing.List
         return f"{ast_element.value.id}.{ast_element.attr}"
-    else:
-        return f"{get_ast_name_or_attribute_string(ast_element.value)}.{ast_element.attr}"
+    # Walk down the attribute chain, e.g. a.b.c is Attribute(value=Attribute(value=Name(id="a"), attr="b"), attr="c")
+    parts = []
+    while isinstance(ast_element, ast.Attribute):
+        parts.append(ast_element.attr)
+        ast_element = ast_element.value
+    parts.append(typing.cast(ast.Name, ast_element).id)
+    return ".".join(reversed(parts))
+
+
+def get_subscript_type(subscript_string: str, type_namespace: TypeNamespace) -> typing.Optional[str]:
+    """
+    Get the typing subscript type (Union, List, Dict or Optional) a name refers to, according to the typing namespace.
+
+    :param subscript_string: The name of the subscripted type, e.g. typing.List
+    :param type_namespace: The current typing namespace to be read
+    :return: The subscript type, or None if the name is not a valid subscript type
+    """
+    for subscript_type in VALID_TYPING_AST_SUBSCRIPT_TYPES:
+        if subscript_string in type_namespace.get(subscript_type, ()):
+            return subscript_type
+    return None
+
+
+def parse_file(file_path: str) -> ast.Module:
+    """
+    Parse a python file into an ast module.
+
+    Parsed modules are kept in memory, keyed by their absolute path and modification time, so files reached several
+    times during a scan (e.g. shared modules behind relative imports) are only parsed once. The returned ast module is
+    shared between callers and must not be modified.
+
+    If the PYTOJSONSCHEMA_CACHE_DIR environment variable is set, parsed modules are also pickled into that directory,
+    keyed by the hash of their source code, the python version and the pytojsonschema version, so unchanged files are
+    not parsed again on later runs.
+
+    :param file_path: The path to the file
+    :return: An ast module object
+    """
+    return _parse_file(os.path.abspath(file_path), os.stat(file_path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_file(file_path: str, mtime_ns: int) -> ast.Module:
+    # mtime_ns is only part of the cache key, so the entry is refreshed when the file changes
+    source = pathlib.Path(file_path).read_bytes()
+    cache_dir = os.environ.get(AST_CACHE_DIR_ENV_VAR)
+    if not cache_dir:
+        return ast.parse(source, filename=file_path)
+    python_version = f"{sys.version_info.major}.{sys.version_info.minor}"
+    cache_path = os.path.join(
+        cache_dir, f"{hashlib.sha256(source).hexdigest()}-py{python_version}-{__version__}.pickle"
+    )
+    # The disk cache is only a speed-up: an entry that is missing or cannot be loaded, e.g. because it was truncated or
+    # corrupted, is a miss, and failing to write one is not an error either
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except Exception:
+        cached = None
+    if isinstance(cached, ast.Module):
+        return cached
+    ast_module = ast.parse(source, filename=file_path)
+    _write_ast_cache(cache_dir, cache_path, ast_module)
+    return ast_module
+
+
+def _write_ast_cache(cache_dir: str, cache_path: str, ast_module: ast.Module) -> None:
+    temporary_path: typing.Optional[str] = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first, so concurrent runs never read a partially written cache entry
+        with tempfile.NamedTemporaryFile("wb", dir=cache_dir, delete=False) as cache_file:
+            temporary_path = cache_file.name
+            pickle.dump(ast_module, cache_file)
+        os.replace(temporary_path, cache_path)
+    except (OSError, pickle.PicklingError):
+        if temporary_path is not None:
+            with contextlib.suppress(OSError):
+                os.remove(temporary_path)
@@ -1,16 +1,23 @@
+from __future__ import annotations
+
 import ast
+import concurrent.futures
 import fnmatch
+import functools
+import itertools
 import logging
 import os
-import pkgutil
+import re
 import typing
 
-from .common import TypeNamespace, SchemaMap, Schema, init_typing_namespace, init_schema_map
+from .common import TypeNamespace, SchemaMap, Schema, init_typing_namespace, init_schema_map, parse_file
 from .jsonschema import get_json_schema_from_ast_element, InvalidTypeAnnotation
 from .types import process_import, process_import_from, process_assign, process_class_def
 
 JSON_SCHEMA_DRAFT = "http://json-schema.org/draft-07/schema#"
 LOGGER = logging.getLogger()
+# Default value of the function arguments that do not have one
+_NO_DEFAULT = object()
 
 
 def process_function_def(
@@ -34,40 +41,48 @@ def process_function_def(
         raise InvalidTypeAnnotation(
             f"Function '{ast_function_def.name}' contains a variable number positional arguments i.e. *args"
         )
-    schema = {
-        "$schema": JSON_SCHEMA_DRAFT,
-        "type": "object",
-        "properties": {},
-        "required": [],
-        "additionalProperties": False,
-    }
+    additional_properties = False
     # Process **kwargs
     if ast_function_def.args.kwarg is not None:
         if ast_function_def.args.kwarg.annotation is None:
             raise InvalidTypeAnnotation(
                 f"Function '{ast_function_def.name}' is missing its **{ast_function_def.args.kwarg.arg} type annotation"
             )
-        schema["additionalProperties"] = get_json_schema_from_ast_element(
+        additional_properties = get_json_schema_from_ast_element(
             ast_function_def.args.kwarg.annotation, type_namespace, schema_map
         )
     # Positional argument defaults is a non-padded list because you cannot have defaults before non-defaulted args
     # Keyword-only arguments, on the other side, can have defaults at random positions, and the default list is padded
+    # with None. Both are aligned with their arguments using _NO_DEFAULT for the ones without a default
     positional_arg_defaults_padding = len(ast_function_def.args.args) - len(ast_function_def.args.defaults)
-    padded_positional_arg_defaults = [None] * positional_arg_defaults_padding + ast_function_def.args.defaults
-    for argument, default in zip(
-        ast_function_def.args.args + ast_function_def.args.kwonlyargs,
-        padded_positional_arg_defaults + ast_function_def.args.kw_defaults,
+    properties = {}
+    required = []
+    for argument, default in itertools.chain(
+        zip(
+            ast_function_def.args.args,
+            itertools.chain(
+                itertools.repeat(_NO_DEFAULT, positional_arg_defaults_padding), ast_function_def.args.defaults
+            ),
+        ),
+        zip(
+            ast_function_def.args.kwonlyargs,
+            [_NO_DEFAULT if default is None else default for default in ast_function_def.args.kw_defaults],
+        ),
     ):
         if argument.annotation is None:
             raise InvalidTypeAnnotation(
                 f"Function '{ast_function_def.name}' is missing type annotation for the parameter '{argument.arg}'"
             )
-        schema["properties"][argument.arg] = get_json_schema_from_ast_element(
-            argument.annotation, type_namespace, schema_map
-        )
-        if default is None:
-            schema["required"].append(argument.arg)
-    return schema
+        properties[argument.arg] = get_json_schema_from_ast_element(argument.annotation, type_namespace, schema_map)
+        if default is _NO_DEFAULT:
+            required.append(argument.arg)
+    return {
+        "$schema": JSON_SCHEMA_DRAFT,
+        "type": "object",
+        "properties": properties,
+        "required": required,
+        "additionalProperties": additional_properties,
+    }
 
 
 def filter_by_patterns(
@@ -86,24 +101,20 @@ def filter_by_patterns(
     :param exclude_patterns: A list of wildcard patterns to match the name you want to exclude
     :return: True if it should be included, False otherwise
     """
-
-    def _is_a_pattern(patterns: typing.List[str]):
-        for pattern in patterns:
-            if fnmatch.fnmatch(name, pattern):
-                return True
+    name = os.path.normcase(name)
+    if exclude_patterns and _compile_patterns(tuple(exclude_patterns)).match(name):
         return False
-
-    is_included = True
-    is_excluded = False
-    if include_patterns:
-        is_included = _is_a_pattern(include_patterns)
-    if exclude_patterns:
-        is_excluded = _is_a_pattern(exclude_patterns)
-    if is_excluded or not is_included:
+    if include_patterns and not _compile_patterns(tuple(include_patterns)).match(name):
         return False
     return True
 
 
+@functools.lru_cache(maxsize=None)
+def _compile_patterns(patterns: typing.Tuple[str, ...]) -> typing.Pattern[str]:
+    # Same matching as fnmatch.fnmatch, but all patterns are merged into a single regular expression compiled once
+    return re.compile("|".join(f"(?:{fnmatch.translate(os.path.normcase(pattern))})" for pattern in patterns))
+
+
 def process_file(
     file_path: str,
     include_patterns: typing.Optional[typing.List[str]] = None,
@@ -119,31 +130,25 @@ def process_file(
     :param exclude_patterns: A list of wildcard patterns to match the function names you want to exclude
     :return: A dictionary containing your function names and their json schemas
     """
-    with open(file_path) as f:
-        ast_body = ast.parse(f.read()).body
+    ast_body = parse_file(file_path).body
+    base_path = os.path.dirname(file_path)
     schema_map = init_schema_map()
     type_namespace = init_typing_namespace()
     function_schema_map = {}
-
-    def _process_function(ast_function_def: ast.FunctionDef):
-        if not filter_by_patterns(ast_function_def.name, include_patterns, exclude_patterns):
-            LOGGER.info(f"Function {ast_function_def.name} skipped")
-        else:
-            function_schema_map[ast_function_def.name] = process_function_def(
-                ast_function_def, type_namespace, schema_map
-            )
-
     for node in ast_body:
-        node_type = type(node)
-        process_map = {
-            ast.Import: lambda: process_import(node, type_namespace, schema_map),
-            ast.ImportFrom: lambda: process_import_from(node, os.path.dirname(file_path), type_namespace, schema_map),
-            ast.Assign: lambda: process_assign(node, type_namespace, schema_map),
-            ast.ClassDef: lambda: process_class_def(node, type_namespace, schema_map),
-            ast.FunctionDef: lambda: _process_function(node),
-        }
-        if node_type in process_map:
-            process_map[node_type]()
+        if isinstance(node, ast.Import):
+            process_import(node, type_namespace, schema_map)
+        elif isinstance(node, ast.ImportFrom):
+            process_import_from(node, base_path, type_namespace, schema_map)
+        elif isinstance(node, ast.Assign):
+            process_assign(node, type_namespace, schema_map)
+        elif isinstance(node, ast.ClassDef):
+            process_class_def(node, type_namespace, schema_map)
+        elif isinstance(node, ast.FunctionDef):
+            if not filter_by_patterns(node.name, include_patterns, exclude_patterns):
+                LOGGER.info(f"Function {node.name} skipped")
+            else:
+                function_schema_map[node.name] = process_function_def(node, type_namespace, schema_map)
     return function_schema_map
 
 
@@ -172,31 +177,41 @@ def package_iterator(
     else:
         import_path = f"{import_prefix}.{package_name}"
     yield import_path, os.path.join(package_path, "__init__.py")
-    for child_module in pkgutil.iter_modules([package_path]):
-        if not filter_by_patterns(child_module.name, include_patterns, exclude_patterns):
-            LOGGER.info(f"Module {package_name}.{child_module.name} skipped")
-            continue
-        if not child_module.ispkg:
-            if import_prefix is None:
-                import_path = f"{package_name}.{child_module.name}"
-            else:
-                import_path = f"{import_prefix}.{package_name}.{child_module.name}"
-            yield import_path, os.path.join(package_path, f"{child_module.name}.py")
+    # Same modules pkgutil.iter_modules finds in a source folder: python files and folders with an __init__.py file,
+    # sorted by name. Like in python's import system, packages take precedence over modules with the same name
+    child_modules = {}
+    with os.scandir(package_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if "." not in entry.name and os.path.isfile(os.path.join(entry.path, "__init__.py")):
+                    child_modules[entry.name] = (entry.path, True)
+            elif entry.name.endswith(".py") and entry.name != "__init__.py" and "." not in entry.name[:-3]:
+                child_modules.setdefault(entry.name[:-3], (entry.path, False))
+    for child_name, (child_path, is_package) in sorted(child_modules.items()):
+        if not filter_by_patterns(child_name, include_patterns, exclude_patterns):
+            LOGGER.info(f"Module {package_name}.{child_name} skipped")
+        elif is_package:
+            yield from package_iterator(child_path, include_patterns, exclude_patterns, import_path)
         else:
-            if import_prefix is None:
-                new_prefix = package_name
-            else:
-                new_prefix = f"{import_prefix}.{package_name}"
-            for inner_import_path, inner_module_math in package_iterator(
-                os.path.join(package_path, child_module.name), include_patterns, exclude_patterns, new_prefix
-            ):
-                yield inner_import_path, inner_module_math
+            yield f"{import_path}.{child_name}", child_path
+
+
+def _process_package_file(
+    package_file: typing.Tuple[str, str, typing.Optional[typing.List[str]], typing.Optional[typing.List[str]]]
+) -> SchemaMap:
+    # Module level, so it can be sent to the worker processes of process_package
+    package_chain, package_file_path, include_patterns, exclude_patterns = package_file
+    return {
+        f"{package_chain}.{func_name}": func_schema
+        for func_name, func_schema in process_file(package_file_path, include_patterns, exclude_patterns).items()
+    }
 
 
 def process_package(
     package_path: str,
     include_patterns: typing.Optional[typing.List[str]] = None,
     exclude_patterns: typing.Optional[typing.List[str]] = None,
+    max_workers: int = 1,
 ) -> SchemaMap:
     """
     Recursively process a package source folder and return all json schemas from the top level functions it can find.
@@ -204,19 +219,25 @@ def process_package(
     You can use optional include/exclude patterns to filter the functions you want to process. These patterns are also
     applied to the file names that are processed, with the exception of __init__.py, which is always processed.
 
+    Files are independent from each other, so they can be processed in parallel by a pool of max_workers processes.
+
     :param package_path: The path to the your python package
     :param include_patterns: A list of wildcard patterns to match the function names you want to include
     :param exclude_patterns: A list of wildcard patterns to match the function names you want to exclude
+    :param max_workers: The number of processes used to process the package files. 1, the default, means no extra
+        processes are spawned
     :return: A dictionary containing your function names and their json schemas
     """
+    package_files = [
+        (package_chain, package_file_path, include_patterns, exclude_patterns)
+        for package_chain, package_file_path in package_iterator(package_path, include_patterns, exclude_patterns)
+    ]
+    if max_workers > 1 and len(package_files) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            file_schema_maps = list(executor.map(_process_package_file, package_files))
+    else:
+        file_schema_maps = map(_process_package_file, package_files)
     function_schema_map = {}
-    for package_chain, package_file_path in package_iterator(package_path, include_patterns, exclude_patterns):
-        function_schema_map.update(
-            **{
-                f"{package_chain}.{func_name}": func_schema
-                for func_name, func_schema in process_file(
-                    package_file_path, include_patterns, exclude_patterns
-                ).items()
-            }
-        )
+    for file_schema_map in file_schema_maps:
+        function_schema_map.update(file_schema_map)
     return function_schema_map
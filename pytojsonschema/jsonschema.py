@@ -1,5 +1,7 @@
+from __future__ import annotations
+
 import ast
-import typing
+import operator
 import platform
 
 from packaging import version
@@ -9,6 +11,7 @@ from .common import (
     SchemaMap,
     Schema,
     get_ast_name_or_attribute_string,
+    get_subscript_type,
     VALID_TYPING_AST_SUBSCRIPT_TYPES,
     InvalidTypeAnnotation,
 )
@@ -16,10 +19,29 @@ from .common import (
 
 PYTHON_VERSION = version.parse(platform.python_version())
 PRE_3_10 = PYTHON_VERSION < version.Version("3.10.0")
+# In python 3.10 ast_element.slice.value has become ast_element.slice
+#
+# example slice: <ast.Tuple object at 0xffffa90aa590>
+# example ctx field value: <ast.Load object at 0xffffb546b0d0>
+# example elts field value: [<ast.Name object at 0xffffb50ae560>, <ast.Name object at 0xffffb50ae530>]
+_get_subscript_slice = operator.attrgetter("slice.value") if PRE_3_10 else operator.attrgetter("slice")
+# Built once instead of on every isinstance check
+_NAME_AST_TYPES = (ast.Name, ast.Attribute)
+_SINGLE_SLICE_AST_TYPES = (ast.Constant, ast.Name, ast.Attribute, ast.Subscript)
+
+
+def _get_schema_or_raise(element_string: str, schema_map: SchemaMap) -> Schema:
+    try:
+        return schema_map[element_string]
+    except KeyError:
+        raise InvalidTypeAnnotation(
+            f"Type '{element_string}' is invalid. Base types and the ones you have imported are "
+            f"{', '.join(schema_map.keys())}. Did you miss an import?"
+        ) from None
 
 
 def get_json_schema_from_ast_element(
-    ast_element: typing.Union[ast.Name, ast.Constant, ast.Attribute, ast.Subscript],
+    ast_element: ast.expr,
     type_namespace: TypeNamespace,
     schema_map: SchemaMap,
 ) -> Schema:
@@ -31,31 +53,16 @@ def get_json_schema_from_ast_element(
     :param schema_map: The current schema map to be read
     :return: A dictionary with the json schema
     """
-
-    def _get_or_raise(element_string: str) -> dict:
-        if element_string not in schema_map:
-            raise InvalidTypeAnnotation(
-                f"Type '{element_string}' is invalid. Base types and the ones you have imported are "
-                f"{', '.join(schema_map.keys())}. Did you miss an import?"
-            )
-        return schema_map[element_string]
-
-    if isinstance(ast_element, ast.Constant) and ast_element.kind is None:
-        return {"type": "null"}
-    elif isinstance(ast_element, (ast.Name, ast.Attribute)):
-        return _get_or_raise(get_ast_name_or_attribute_string(ast_element))
+    # Checked from the most to the least frequent kind of element
+    if isinstance(ast_element, _NAME_AST_TYPES):
+        return _get_schema_or_raise(get_ast_name_or_attribute_string(ast_element), schema_map)
     elif isinstance(ast_element, ast.Subscript):  # typing.List, typing.Dict, typing.Union and typing.Optional
         subscript_string = get_ast_name_or_attribute_string(ast_element.value)
-        subscript_type = None
-        for key in VALID_TYPING_AST_SUBSCRIPT_TYPES:
-            if subscript_string in type_namespace.get(key, {}):
-                subscript_type = key
-                break
+        subscript_type = get_subscript_type(subscript_string, type_namespace)
         if subscript_type is None:
-            imported_types = []
-            for key in VALID_TYPING_AST_SUBSCRIPT_TYPES:
-                for element in type_namespace.get(key, {}):
-                    imported_types.append(element)
+            imported_types = [
+                element for key in VALID_TYPING_AST_SUBSCRIPT_TYPES for element in type_namespace.get(key, ())
+            ]
             if imported_types:
                 error_msg = (
                     f"Type '{subscript_string}' is invalid. You have imported {', '.join(sorted(imported_types))}, and "
@@ -68,13 +75,8 @@ def get_json_schema_from_ast_element(
                 )
             raise InvalidTypeAnnotation(error_msg)
 
-        # In python 3.10 ast_element.slice.value has become ast_element.slice
-        #
-        # example slice: <ast.Tuple object at 0xffffa90aa590>
-        # example ctx field value: <ast.Load object at 0xffffb546b0d0>
-        # example elts field value: [<ast.Name object at 0xffffb50ae560>, <ast.Name object at 0xffffb50ae530>]
-        slice_object = ast_element.slice.value if PRE_3_10 else ast_element.slice
-        if isinstance(slice_object, (ast.Constant, ast.Name, ast.Attribute, ast.Subscript)):
+        slice_object = _get_subscript_slice(ast_element)
+        if isinstance(slice_object, _SINGLE_SLICE_AST_TYPES):
             inner_schema = get_json_schema_from_ast_element(slice_object, type_namespace, schema_map)
             if subscript_type == "List":
                 return {"type": "array", "items": inner_schema}
@@ -99,5 +101,7 @@ def get_json_schema_from_ast_element(
                         for element in slice_object.elts
                     ]
                 }
+    elif isinstance(ast_element, ast.Constant) and ast_element.kind is None:
+        return {"type": "null"}
     else:
         raise InvalidTypeAnnotation(f"Unknown type annotation ast element '{str(type(ast_element))}'")
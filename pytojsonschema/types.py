@@ -1,4 +1,8 @@
+from __future__ import annotations
+
 import ast
+import collections
+import copy
 import os
 import typing
 
@@ -6,14 +10,23 @@ from .common import (
     TypeNamespace,
     SchemaMap,
     get_ast_name_or_attribute_string,
+    get_subscript_type,
     init_schema_map,
     init_typing_namespace,
-    VALID_TYPING_AST_SUBSCRIPT_TYPES,
+    parse_file,
     VALID_TYPING_TYPES,
     VALID_ENUM_TYPES,
 )
 from .jsonschema import get_json_schema_from_ast_element
 
+# Schema maps of the modules reached via relative imports, keyed by their absolute path, and stored along with the
+# modification time of every file they were built from. They are shared, so they must not be modified. Like the parsed
+# files cache, it is bounded, so long-running processes scanning many packages do not keep every module forever
+_MODULE_SCHEMA_MAP_CACHE: typing.OrderedDict[
+    str, typing.Tuple[SchemaMap, typing.Dict[str, int]]
+] = collections.OrderedDict()
+_MODULE_SCHEMA_MAP_CACHE_SIZE = 4096
+
 ANY_SCHEMA = {
     "anyOf": [
         {"type": "object"},
@@ -25,6 +38,12 @@ ANY_SCHEMA = {
         {"type": "number"},
     ]
 }
+# Attribute suffixes of the valid types, e.g. ("List", ".List"), so "import typing" does not format them every time
+_TYPING_TYPE_SUFFIXES = tuple((valid_type, f".{valid_type}") for valid_type in VALID_TYPING_TYPES)
+_ENUM_TYPE_SUFFIXES = tuple((valid_type, f".{valid_type}") for valid_type in VALID_ENUM_TYPES)
+
+# Types of the constants allowed as enum values. ast constants are never instances of subclasses of these
+_ENUM_VALUE_TYPES = frozenset({str, int, float, bool, type(None)})
 
 
 def process_alias(ast_alias: ast.alias) -> str:
@@ -40,7 +59,7 @@ def process_alias(ast_alias: ast.alias) -> str:
         return ast_alias.asname
 
 
-def process_import(ast_import: ast.Import, type_namespace: TypeNamespace, schema_map: SchemaMap) -> typing.NoReturn:
+def process_import(ast_import: ast.Import, type_namespace: TypeNamespace, schema_map: SchemaMap) -> None:
     """
     This function accomplishes two things:
     - Process a normal import to add typing or a typing alias to the typing namespace
@@ -53,20 +72,17 @@ def process_import(ast_import: ast.Import, type_namespace: TypeNamespace, schema
     for import_name in ast_import.names:
         module_element = process_alias(import_name)
         if import_name.name == "typing":
-            for valid_type in VALID_TYPING_TYPES:
-                element = f"{module_element}.{valid_type}"
-                type_namespace[valid_type].add(element)
-                if valid_type == "Any":
-                    schema_map[element] = ANY_SCHEMA
+            for valid_type, suffix in _TYPING_TYPE_SUFFIXES:
+                type_namespace[valid_type].add(module_element + suffix)
+            schema_map[module_element + ".Any"] = ANY_SCHEMA
         elif import_name.name == "enum":
-            for valid_type in VALID_ENUM_TYPES:
-                element = f"{module_element}.{valid_type}"
-                type_namespace[valid_type].add(element)
+            for valid_type, suffix in _ENUM_TYPE_SUFFIXES:
+                type_namespace[valid_type].add(module_element + suffix)
 
 
 def process_import_from(
     ast_import_from: ast.ImportFrom, base_path: str, type_namespace: TypeNamespace, schema_map: SchemaMap
-) -> typing.NoReturn:
+) -> None:
     """
     This function accomplishes two things:
     - Process a "from typing import *" kind of import to achieve what the process_import does
@@ -92,33 +108,65 @@ def process_import_from(
                     type_namespace[import_name.name].add(element)
     # Level >= 1 are relative imports. 1 is the current directory, 2 the parent, 3 the grandparent, and so on.
     else:
-        module = f"{ast_import_from.module}.py" if ast_import_from.module else "__init__.py"
-        new_base_path = base_path
-        for _ in range(ast_import_from.level - 1):
-            new_base_path = os.path.join(new_base_path, os.pardir)
-        path = os.path.join(new_base_path, module)
-        with open(path) as f:
-            ast_module = ast.parse(f.read())
-        new_typing_namespace = init_typing_namespace()
-        new_schema_map = init_schema_map()
-        for node in ast_module.body:
-            if isinstance(node, ast.Import):
-                process_import(node, new_typing_namespace, new_schema_map)
-            elif isinstance(node, ast.ImportFrom):
-                process_import_from(node, new_base_path, new_typing_namespace, new_schema_map)
-            elif isinstance(node, ast.Assign) and node.targets[0].id:
-                process_assign(node, new_typing_namespace, new_schema_map)
-            elif isinstance(node, ast.ClassDef) and node.name:
-                process_class_def(node, new_typing_namespace, new_schema_map)
-        for import_name in ast_import_from.names:
-            item = new_schema_map.get(import_name.name)
-            if item is not None:  # Import could be something we didn't care about and hence didn't put in schema_map
-                schema_map[import_name.name] = item
-
-
-def process_class_def(
-    ast_class_def: ast.ClassDef, type_namespace: TypeNamespace, schema_map: SchemaMap
-) -> typing.NoReturn:
+        _process_relative_import_from(ast_import_from, base_path, schema_map)
+
+
+def _process_relative_import_from(
+    ast_import_from: ast.ImportFrom, base_path: str, schema_map: SchemaMap
+) -> typing.Dict[str, int]:
+    # Returns the modification time of all the files the imported schemas come from, keyed by their absolute path
+    module = f"{ast_import_from.module}.py" if ast_import_from.module else "__init__.py"
+    # Walking up an absolute path with dirname never needs ".." segments, and the result is already normalized
+    new_base_path = os.path.abspath(base_path)
+    for _ in range(ast_import_from.level - 1):
+        new_base_path = os.path.dirname(new_base_path)
+    module_schema_map, dependencies = _get_module_schema_map(os.path.join(new_base_path, module))
+    for import_name in ast_import_from.names:
+        item = module_schema_map.get(import_name.name)
+        if item is not None:  # Import could be something we didn't care about and hence didn't put in schema_map
+            # Copied, as the cached schema would otherwise end up in the results callers are free to modify
+            schema_map[import_name.name] = copy.deepcopy(item)
+    return dependencies
+
+
+def _get_module_schema_map(path: str) -> typing.Tuple[SchemaMap, typing.Dict[str, int]]:
+    abs_path = os.path.abspath(path)
+    cached = _MODULE_SCHEMA_MAP_CACHE.get(abs_path)
+    if cached is not None and _is_up_to_date(cached[1]):
+        _MODULE_SCHEMA_MAP_CACHE.move_to_end(abs_path)
+        return cached
+    # Stat before parsing, so a file changing in between is rebuilt next time rather than cached as up to date
+    dependencies = {abs_path: os.stat(abs_path).st_mtime_ns}
+    ast_module = parse_file(abs_path)
+    base_path = os.path.dirname(path)
+    type_namespace = init_typing_namespace()
+    module_schema_map = init_schema_map()
+    for node in ast_module.body:
+        if isinstance(node, ast.Import):
+            process_import(node, type_namespace, module_schema_map)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level == 0:
+                process_import_from(node, base_path, type_namespace, module_schema_map)
+            else:
+                dependencies.update(_process_relative_import_from(node, base_path, module_schema_map))
+        elif isinstance(node, ast.Assign):
+            process_assign(node, type_namespace, module_schema_map)
+        elif isinstance(node, ast.ClassDef):
+            process_class_def(node, type_namespace, module_schema_map)
+    _MODULE_SCHEMA_MAP_CACHE[abs_path] = module_schema_map, dependencies
+    _MODULE_SCHEMA_MAP_CACHE.move_to_end(abs_path)
+    if len(_MODULE_SCHEMA_MAP_CACHE) > _MODULE_SCHEMA_MAP_CACHE_SIZE:
+        _MODULE_SCHEMA_MAP_CACHE.popitem(last=False)  # Least recently used
+    return module_schema_map, dependencies
+
+
+def _is_up_to_date(dependencies: typing.Dict[str, int]) -> bool:
+    # Importers are always checked before the modules they import, so a module that is not imported anymore (and might
+    # have been deleted) is never checked: its importer changed and the check stops there
+    return all(os.stat(path).st_mtime_ns == mtime_ns for path, mtime_ns in dependencies.items())
+
+
+def process_class_def(ast_class_def: ast.ClassDef, type_namespace: TypeNamespace, schema_map: SchemaMap) -> None:
     """
     Process a class def statement to update the schema map with types we can define with TypedDict's class-based syntax.
     Example:
@@ -136,10 +184,12 @@ def process_class_def(
     """
     # This supports TypedDict class syntax
     if ast_class_def.bases:
-        if get_ast_name_or_attribute_string(ast_class_def.bases[0]) in type_namespace.get("TypedDict", set()):
+        # The typing namespace always has all the valid types as keys, see init_typing_namespace
+        base_class = get_ast_name_or_attribute_string(ast_class_def.bases[0])
+        if base_class in type_namespace["TypedDict"]:
             properties = {}
             required = []
-            for index, node in enumerate(ast_class_def.body):
+            for node in ast_class_def.body:
                 if isinstance(node, ast.AnnAssign):
                     properties[node.target.id] = get_json_schema_from_ast_element(
                         node.annotation, type_namespace, schema_map
@@ -152,13 +202,11 @@ def process_class_def(
                 "required": required,
                 "additionalProperties": False,
             }
-        elif get_ast_name_or_attribute_string(ast_class_def.bases[0]) in type_namespace.get("Enum", set()):
+        elif base_class in type_namespace["Enum"]:
             choices = []
-            for index, node in enumerate(ast_class_def.body):
+            for node in ast_class_def.body:
                 if isinstance(node, ast.Assign):
-                    if not isinstance(node.value, ast.Constant) or (
-                        not isinstance(node.value.value, (str, int, float, bool)) and node.value.value is not None
-                    ):
+                    if not isinstance(node.value, ast.Constant) or type(node.value.value) not in _ENUM_VALUE_TYPES:
                         return  # All properties of the enum must be constants: None, int, float, bool, str
                     else:
                         choices.append(node.value.value)
@@ -167,7 +215,7 @@ def process_class_def(
             }
 
 
-def process_assign(ast_assign: ast.Assign, type_namespace: TypeNamespace, schema_map: SchemaMap) -> typing.NoReturn:
+def process_assign(ast_assign: ast.Assign, type_namespace: TypeNamespace, schema_map: SchemaMap) -> None:
     """
     Process an assign statement to update the schema map with types we can define with subscripts.
     Example:
@@ -182,15 +230,12 @@ def process_assign(ast_assign: ast.Assign, type_namespace: TypeNamespace, schema
     :param schema_map: The current schema map to be updated
     """
     if (
-        isinstance(ast_assign.targets[0], ast.Name)
-        and isinstance(ast_assign.value, ast.Subscript)
-        and get_ast_name_or_attribute_string(ast_assign.value.value)
-        in (
-            item
-            for values in (type_namespace[subscript_type] for subscript_type in VALID_TYPING_AST_SUBSCRIPT_TYPES)
-            for item in values
-        )
+        not isinstance(ast_assign.targets[0], ast.Name)
+        or not isinstance(ast_assign.value, ast.Subscript)
+        or not isinstance(ast_assign.value.value, (ast.Name, ast.Attribute))  # Only names can be typing types
     ):
+        return
+    if get_subscript_type(get_ast_name_or_attribute_string(ast_assign.value.value), type_namespace) is not None:
         schema_map[ast_assign.targets[0].id] = get_json_schema_from_ast_element(
             ast_assign.value, type_namespace, schema_map
         )
@@ -1,4 +1,6 @@
 import os
+import re
+
 from setuptools import setup
 
 TEST_DEPENDENCIES = [
@@ -8,21 +10,36 @@ TEST_DEPENDENCIES = [
     "pytest-cov==4.1.0",
 ]
 
-with open(os.path.join(os.path.abspath(os.path.dirname(__file__)), "README.md"), encoding="utf-8") as f:
+HERE = os.path.abspath(os.path.dirname(__file__))
+
+with open(os.path.join(HERE, "README.md"), encoding="utf-8") as f:
     LONG_DESCRIPTION = f.read()
 
+# pytojsonschema.__version__ is the single source of truth. Read rather than imported, so building needs no import
+with open(os.path.join(HERE, "pytojsonschema", "__init__.py"), encoding="utf-8") as f:
+    VERSION = re.search(r'^__version__ = "([^"]+)"$', f.read(), re.MULTILINE).group(1)
+
+# Opt-in compilation of the ast visitor modules to C extensions with mypyc. The pure python package is built otherwise
+if os.environ.get("PYTOJSONSCHEMA_USE_MYPYC") == "1":
+    from mypyc.build import mypycify
+
+    EXT_MODULES = mypycify(["pytojsonschema/common.py", "pytojsonschema/jsonschema.py"])
+else:
+    EXT_MODULES = []
+
 setup(
     name="pytojsonschema",
     description="A package to convert Python type annotations into JSON schemas",
     long_description=LONG_DESCRIPTION,
     long_description_content_type="text/markdown",
-    version="2.0.0",
+    version=VERSION,
     author="Osirium",
     author_email="support@osirium.com",
     maintainer="Carlos Ruiz Lantero",
     maintainer_email="carlos.ruiz.lantero@gmail.com",
     url="https://github.com/Osirium/pytojsonschema",
     packages=["pytojsonschema"],
+    ext_modules=EXT_MODULES,
     classifiers=[
         "Operating System :: OS Independent",
         "Programming Language :: Python",
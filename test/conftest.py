@@ -1,7 +1,14 @@
+import ast
+import functools
 import typing
 
 import pytest
 
+from pytojsonschema.common import init_schema_map, init_typing_namespace
+
+# Built once for the parametrize tables, see schema_map_with and typing_namespace_with
+_INIT_SCHEMA_MAP = init_schema_map()
+_INIT_TYPING_NAMESPACE = init_typing_namespace()
 TEST_TYPING_NAMESPACE = {
     "Union": {"typing.Union"},
     "List": {"typing.List"},
@@ -12,10 +19,48 @@ TEST_TYPING_NAMESPACE = {
 }
 
 
-def assert_expected(callback: typing.Callable, expected: typing.Any) -> typing.NoReturn:
+@pytest.fixture
+def check_test_typing_namespace():
+    # TEST_TYPING_NAMESPACE is shared by many rows of code that only reads it, so any accidental write fails the test.
+    # Requested by the modules that use it, with pytestmark
+    snapshot = {key: set(value) for key, value in TEST_TYPING_NAMESPACE.items()}
+    yield
+    assert TEST_TYPING_NAMESPACE == snapshot
+
+
+def schema_map_with(**extra_schemas: typing.Any) -> dict:
+    # A new top level dict on every call, so rows can hand it to code that adds schemas to it
+    return {**_INIT_SCHEMA_MAP, **extra_schemas}
+
+
+def typing_namespace_with(**extra_types: typing.Any) -> dict:
+    # Unchanged type sets are shared, so it is only meant for code that reads the namespace
+    return {**_INIT_TYPING_NAMESPACE, **extra_types}
+
+
+@pytest.fixture
+def fresh_state() -> typing.Tuple[dict, dict]:
+    # A typing namespace and a schema map for code that writes to them. They are built by the init functions rather
+    # than copied from the shared bases above, because a shallow copy of a namespace would share its type sets
+    return init_typing_namespace(), init_schema_map()
+
+
+def assert_expected(function: typing.Callable, *args: typing.Any, expected: typing.Any) -> None:
     if isinstance(expected, Exception):
         with pytest.raises(expected.__class__) as exception:
-            callback()
+            function(*args)
         assert str(exception.value) == expected.args[0]
     else:
-        assert callback() == expected
+        assert function(*args) == expected
+
+
+@functools.lru_cache(maxsize=None)
+def parse_cached(source: str) -> ast.Module:
+    # Parametrize tables share their snippets, so each one is only parsed once. The ast objects must not be modified
+    return ast.parse(source)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_expression_cached(source: str) -> ast.expr:
+    # Same as parse_cached, for snippets that are a single expression, e.g. a type annotation
+    return ast.parse(source, mode="eval").body
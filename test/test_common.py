@@ -1,8 +1,22 @@
 import ast
+import hashlib
+import os
+import pickle
+import sys
 
 import pytest
 
-from pytojsonschema.common import init_typing_namespace, init_schema_map, get_ast_name_or_attribute_string
+from pytojsonschema import __version__
+from pytojsonschema.common import (
+    AST_CACHE_DIR_ENV_VAR,
+    init_typing_namespace,
+    init_schema_map,
+    get_ast_name_or_attribute_string,
+    get_subscript_type,
+    parse_file,
+)
+
+from .conftest import parse_expression_cached
 
 
 def test_init_typing_namespace():
@@ -19,17 +33,98 @@ def test_init_typing_namespace():
 
 def test_init_schema_map():
     assert init_schema_map() == init_schema_map()
+    assert init_schema_map()["int"] is not init_schema_map()["int"]
 
 
 @pytest.mark.parametrize(
     "ast_element, expected",
     [
-        [ast.parse("a").body[0].value, "a"],
-        [ast.parse("a.b").body[0].value, "a.b"],
-        [ast.parse("a.b.c").body[0].value, "a.b.c"],
-        [ast.parse("a.b.c.d").body[0].value, "a.b.c.d"],
+        pytest.param(parse_expression_cached("a"), "a", id="single"),
+        pytest.param(parse_expression_cached("a.b"), "a.b", id="double"),
+        pytest.param(parse_expression_cached("a.b.c"), "a.b.c", id="triple"),
+        pytest.param(parse_expression_cached("a.b.c.d"), "a.b.c.d", id="quadruple"),
     ],
-    ids=["single", "double", "triple", "quadruple"],
 )
 def test_get_ast_attribute_string(ast_element, expected):
     assert get_ast_name_or_attribute_string(ast_element) == expected
+
+
+@pytest.mark.parametrize(
+    "subscript_string, type_namespace, expected",
+    [
+        pytest.param("typing.List", {"List": {"typing.List"}, "Dict": {"typing.Dict"}}, "List", id="found"),
+        pytest.param("Dict", {"List": {"typing.List"}, "Dict": {"Dict"}}, "Dict", id="found_alias"),
+        pytest.param("typing.Dict", {"List": {"typing.List"}}, None, id="not_found"),
+        pytest.param("typing.Any", {"Any": {"typing.Any"}}, None, id="not_a_subscript_type"),
+    ],
+)
+def test_get_subscript_type(subscript_string, type_namespace, expected):
+    assert get_subscript_type(subscript_string, type_namespace) == expected
+
+
+def test_parse_file(monkeypatch, tmp_path):
+    monkeypatch.delenv(AST_CACHE_DIR_ENV_VAR, raising=False)
+    file_path = tmp_path / "foo.py"
+    file_path.write_text("import typing\n\n\ndef foo(a: int): pass\n")
+    ast_module = parse_file(str(file_path))
+    assert ast.dump(ast_module) == ast.dump(ast.parse("import typing\n\n\ndef foo(a: int): pass\n"))
+    assert parse_file(str(file_path)) is ast_module
+    file_path.write_text("import enum\n")
+    os.utime(file_path, ns=(0, os.stat(file_path).st_mtime_ns + 1))
+    assert ast.dump(parse_file(str(file_path))) == ast.dump(ast.parse("import enum\n"))
+
+
+def test_parse_file_syntax_error(tmp_path):
+    file_path = tmp_path / "foo.py"
+    file_path.write_text("def foo(:\n")
+    with pytest.raises(SyntaxError) as exception:
+        parse_file(str(file_path))
+    assert exception.value.filename == str(file_path)
+
+
+def test_parse_file_disk_cache(monkeypatch, tmp_path):
+    file_path = tmp_path / "foo.py"
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv(AST_CACHE_DIR_ENV_VAR, str(cache_dir))
+    file_path.write_text("import typing\n\n\ndef foo(a: int): pass\n")
+    expected = ast.dump(ast.parse("import typing\n\n\ndef foo(a: int): pass\n"))
+    assert ast.dump(parse_file(str(file_path))) == expected  # Cache miss
+    (cache_path,) = cache_dir.iterdir()
+    # Replace the cached module, so the next result tells whether it was loaded from the cache or parsed again
+    cached = ast.parse("import enum\n")
+    cache_path.write_bytes(pickle.dumps(cached))
+    # Touching the file skips the in-memory cache, but its content did not change
+    os.utime(file_path, ns=(0, os.stat(file_path).st_mtime_ns + 1))
+    assert ast.dump(parse_file(str(file_path))) == ast.dump(cached)  # Cache hit
+    assert list(cache_dir.iterdir()) == [cache_path]
+
+
+def _get_cache_file_name(source: str) -> str:
+    python_version = f"{sys.version_info.major}.{sys.version_info.minor}"
+    return f"{hashlib.sha256(source.encode()).hexdigest()}-py{python_version}-{__version__}.pickle"
+
+
+def test_parse_file_disk_cache_errors(monkeypatch, tmp_path):
+    source = "import typing\n\n\ndef foo(a: int): pass\n"
+    expected = ast.dump(ast.parse(source))
+    file_path = tmp_path / "foo.py"
+    file_path.write_text(source)
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setenv(AST_CACHE_DIR_ENV_VAR, str(cache_dir))
+    # A corrupted cache entry is parsed again, and replaced
+    cache_path = cache_dir / _get_cache_file_name(source)
+    cache_path.write_bytes(b"(garbage")
+    assert ast.dump(parse_file(str(file_path))) == expected
+    assert ast.dump(pickle.loads(cache_path.read_bytes())) == expected
+    # An entry that cannot be written does not leave its temporary file behind
+    cache_path.unlink()
+    cache_path.mkdir()
+    (cache_path / "foo").touch()
+    os.utime(file_path, ns=(0, os.stat(file_path).st_mtime_ns + 1))
+    assert ast.dump(parse_file(str(file_path))) == expected
+    assert list(cache_dir.iterdir()) == [cache_path]
+    # Neither does a cache directory that cannot be created
+    monkeypatch.setenv(AST_CACHE_DIR_ENV_VAR, str(file_path))
+    os.utime(file_path, ns=(0, os.stat(file_path).st_mtime_ns + 1))
+    assert ast.dump(parse_file(str(file_path))) == expected
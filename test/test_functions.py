@@ -1,41 +1,50 @@
 import ast
-import functools
 import os
-import tempfile
 
 import pytest
 
-from pytojsonschema.common import init_schema_map, InvalidTypeAnnotation
-from pytojsonschema.functions import filter_by_patterns, process_function_def, process_file, process_package
+from pytojsonschema.common import InvalidTypeAnnotation
+from pytojsonschema.functions import (
+    filter_by_patterns,
+    package_iterator,
+    process_function_def,
+    process_file,
+    process_package,
+)
+
+from .conftest import assert_expected, schema_map_with, TEST_TYPING_NAMESPACE
 
-from .conftest import assert_expected, TEST_TYPING_NAMESPACE
+pytestmark = pytest.mark.usefixtures("check_test_typing_namespace")
 
 
 @pytest.mark.parametrize(
     "ast_function_def, type_namespace, schema_map, expected",
     [
-        [
+        pytest.param(
             ast.parse("def foo(a, /): pass").body[0],
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             InvalidTypeAnnotation("Function 'foo' contains positional only arguments"),
-        ],
-        [
+            id="posonly_args",
+        ),
+        pytest.param(
             ast.parse("def foo(a, *args): pass").body[0],
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             InvalidTypeAnnotation("Function 'foo' contains a variable number positional arguments i.e. *args"),
-        ],
-        [
+            id="args",
+        ),
+        pytest.param(
             ast.parse("def foo(**bar): pass").body[0],
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             InvalidTypeAnnotation("Function 'foo' is missing its **bar type annotation"),
-        ],
-        [
+            id="missing_kwargs_annotation",
+        ),
+        pytest.param(
             ast.parse("def foo(**bar: int): pass").body[0],
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             {
                 "$schema": "http://json-schema.org/draft-07/schema#",
                 "type": "object",
@@ -43,17 +52,19 @@ from .conftest import assert_expected, TEST_TYPING_NAMESPACE
                 "required": [],
                 "additionalProperties": {"type": "integer"},
             },
-        ],
-        [
+            id="valid_kwargs",
+        ),
+        pytest.param(
             ast.parse("def foo(a): pass").body[0],
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             InvalidTypeAnnotation("Function 'foo' is missing type annotation for the parameter 'a'"),
-        ],
-        [
+            id="missing_arg",
+        ),
+        pytest.param(
             ast.parse("def foo(a: int = 3): pass").body[0],
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             {
                 "$schema": "http://json-schema.org/draft-07/schema#",
                 "type": "object",
@@ -61,11 +72,12 @@ from .conftest import assert_expected, TEST_TYPING_NAMESPACE
                 "required": [],
                 "additionalProperties": False,
             },
-        ],
-        [
+            id="arg_default",
+        ),
+        pytest.param(
             ast.parse("def foo(a: int): pass").body[0],
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             {
                 "$schema": "http://json-schema.org/draft-07/schema#",
                 "type": "object",
@@ -73,60 +85,105 @@ from .conftest import assert_expected, TEST_TYPING_NAMESPACE
                 "required": ["a"],
                 "additionalProperties": False,
             },
-        ],
-    ],
-    ids=[
-        "posonly_args",
-        "args",
-        "missing_kwargs_annotation",
-        "valid_kwargs",
-        "missing_arg",
-        "arg_default",
-        "arg_no_default",
+            id="arg_no_default",
+        ),
+        pytest.param(
+            ast.parse("def foo(a: int, b: str = 'b', *, c: bool, d: float = 3.14): pass").body[0],
+            TEST_TYPING_NAMESPACE,
+            schema_map_with(),
+            {
+                "$schema": "http://json-schema.org/draft-07/schema#",
+                "type": "object",
+                "properties": {
+                    "a": {"type": "integer"},
+                    "b": {"type": "string"},
+                    "c": {"type": "boolean"},
+                    "d": {"type": "number"},
+                },
+                "required": ["a", "c"],
+                "additionalProperties": False,
+            },
+            id="args_and_kwonly_args_defaults",
+        ),
     ],
 )
 def test_process_function_def(ast_function_def, type_namespace, schema_map, expected):
-    assert_expected(functools.partial(process_function_def, ast_function_def, type_namespace, schema_map), expected)
+    assert_expected(process_function_def, ast_function_def, type_namespace, schema_map, expected=expected)
 
 
 @pytest.mark.parametrize(
     "name, include_patterns, exclude_patterns, expected",
     [
-        ["foo", None, None, True],
-        ["foo", ["bar*"], None, False],
-        ["foo", ["foo*"], None, True],
-        ["foo", None, ["bar*"], True],
-        ["foo", None, ["foo*"], False],
-        ["foo", ["foo*"], ["bar*"], True],
-        ["foo", ["foo*"], ["foo*"], False],
-    ],
-    ids=[
-        "no_patterns",
-        "include_miss",
-        "include_finds",
-        "exclude_miss",
-        "exclude_finds",
-        "exclude_override_miss",
-        "exclude_override_finds",
+        pytest.param("foo", None, None, True, id="no_patterns"),
+        pytest.param("foo", ["bar*"], None, False, id="include_miss"),
+        pytest.param("foo", ["foo*"], None, True, id="include_finds"),
+        pytest.param("foo", None, ["bar*"], True, id="exclude_miss"),
+        pytest.param("foo", None, ["foo*"], False, id="exclude_finds"),
+        pytest.param("foo", ["foo*"], ["bar*"], True, id="exclude_override_miss"),
+        pytest.param("foo", ["foo*"], ["foo*"], False, id="exclude_override_finds"),
+        pytest.param("foo", ["bar*", "f?o"], None, True, id="include_many_finds"),
+        pytest.param("foo", None, ["bar*", "[ef]oo"], False, id="exclude_many_finds"),
     ],
 )
 def test_filter_by_patterns(name, include_patterns, exclude_patterns, expected):
     assert filter_by_patterns(name, include_patterns, exclude_patterns) == expected
 
 
-def test_process_file():
-    with tempfile.NamedTemporaryFile("w") as f:
-        f.write("import typing\n\n\ndef foo(a: int): pass\n\n\ndef bar(b: int): pass\n\n\neval(3)")
-        f.flush()
-        assert process_file(f.name, None, ["bar*"]) == {
-            "foo": {
-                "$schema": "http://json-schema.org/draft-07/schema#",
-                "type": "object",
-                "properties": {"a": {"type": "integer"}},
-                "required": ["a"],
-                "additionalProperties": False,
-            }
+def test_process_file(tmp_path):
+    file_path = tmp_path / "foo.py"
+    file_path.write_text("import typing\n\n\ndef foo(a: int): pass\n\n\ndef bar(b: int): pass\n\n\neval(3)")
+    assert process_file(str(file_path), None, ["bar*"]) == {
+        "foo": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "properties": {"a": {"type": "integer"}},
+            "required": ["a"],
+            "additionalProperties": False,
         }
+    }
+
+
+def test_process_file_results_are_not_shared(tmp_path):
+    (tmp_path / "foo.py").write_text("import typing\n\n\nclass B(typing.TypedDict):\n    x: int\n")
+    file_path = tmp_path / "main.py"
+    file_path.write_text("from .foo import B\n\n\ndef f(a: B): pass\n")
+    result = process_file(str(file_path))
+    result["f"]["properties"]["a"]["description"] = "mine"
+    result["f"]["properties"]["a"]["properties"]["x"]["minimum"] = 0
+    assert process_file(str(file_path))["f"]["properties"]["a"] == {
+        "type": "object",
+        "properties": {"x": {"type": "integer"}},
+        "required": ["x"],
+        "additionalProperties": False,
+    }
+
+
+def test_package_iterator(tmp_path):
+    package = tmp_path / "package"
+    for folder in ("foo", "bar", "baz", "not_a_package", "foo.bar"):
+        (package / folder).mkdir(parents=True)
+    for file_path in (
+        "__init__.py",
+        "a.py",
+        "foo.py",
+        "foo.bar.py",
+        "notes.txt",
+        "foo/__init__.py",
+        "bar/__init__.py",
+        "bar/b.py",
+        "baz/__init__.py",
+        "not_a_package/c.py",
+        "foo.bar/__init__.py",
+    ):
+        (package / file_path).touch()
+    package = str(package)
+    assert list(package_iterator(package, exclude_patterns=["baz"])) == [
+        ("package", os.path.join(package, "__init__.py")),
+        ("package.a", os.path.join(package, "a.py")),
+        ("package.bar", os.path.join(package, "bar", "__init__.py")),
+        ("package.bar.b", os.path.join(package, "bar", "b.py")),
+        ("package.foo", os.path.join(package, "foo", "__init__.py")),
+    ]
 
 
 def test_process_package():
@@ -198,6 +255,7 @@ def test_process_package():
     expected.update(init_schema)
     assert process_package(os.path.join("test", "example")) == expected
     assert process_package(os.path.join("test", "example"), exclude_patterns=["service*"]) == init_schema
+    assert process_package(os.path.join("test", "example"), max_workers=2) == expected
     current_dir = os.getcwd()
     os.chdir("test")
     try:
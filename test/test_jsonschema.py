@@ -1,112 +1,114 @@
-import ast
-import functools
-
 import pytest
 
-from pytojsonschema.common import init_schema_map, InvalidTypeAnnotation
+from pytojsonschema.common import InvalidTypeAnnotation
 from pytojsonschema.jsonschema import get_json_schema_from_ast_element
 from pytojsonschema.types import ANY_SCHEMA
 
-from .conftest import assert_expected, TEST_TYPING_NAMESPACE
+from .conftest import parse_expression_cached, schema_map_with, TEST_TYPING_NAMESPACE
+
+pytestmark = pytest.mark.usefixtures("check_test_typing_namespace")
 
 
 @pytest.mark.parametrize(
     "ast_element, type_namespace, schema_map, expected",
     [
-        [ast.parse("None").body[0].value, TEST_TYPING_NAMESPACE, init_schema_map(), {"type": "null"}],
-        [ast.parse("bool").body[0].value, TEST_TYPING_NAMESPACE, init_schema_map(), {"type": "boolean"}],
-        [
-            ast.parse("complex").body[0].value,
-            TEST_TYPING_NAMESPACE,
-            init_schema_map(),
-            InvalidTypeAnnotation(
-                "Type 'complex' is invalid. Base types and the ones you have imported are bool, int, float, str. "
-                "Did you miss an import?"
-            ),
-        ],
-        [
-            ast.parse("Union[str, int]").body[0].value,
+        pytest.param(
+            parse_expression_cached("None"), TEST_TYPING_NAMESPACE, schema_map_with(), {"type": "null"}, id="null"
+        ),
+        pytest.param(
+            parse_expression_cached("bool"), TEST_TYPING_NAMESPACE, schema_map_with(), {"type": "boolean"}, id="base"
+        ),
+        pytest.param(
+            parse_expression_cached("typing.List[str]"),
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
-            InvalidTypeAnnotation(
-                "Type 'Union' is invalid. You have imported typing.Dict, typing.List, typing.Optional, "
-                "typing.Union, and we allow Dict, List, Optional, Union. Did you miss an import?"
-            ),
-        ],
-        [
-            ast.parse("typing.Union[str, int]").body[0].value,
-            {},
-            init_schema_map(),
-            InvalidTypeAnnotation(
-                "Type 'typing.Union' is invalid, but no valid types were found. Did you forget importing typing?"
-            ),
-        ],
-        [
-            ast.parse("typing.List[str]").body[0].value,
-            TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             {"type": "array", "items": {"type": "string"}},
-        ],
-        [
-            ast.parse("typing.Optional[int]").body[0].value,
+            id="list",
+        ),
+        pytest.param(
+            parse_expression_cached("typing.Optional[int]"),
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             {"anyOf": [{"type": "integer"}, {"type": "null"}]},
-        ],
-        [
-            ast.parse("typing.Optional[typing.Any]").body[0].value,
+            id="optional",
+        ),
+        pytest.param(
+            parse_expression_cached("typing.Optional[typing.Any]"),
             TEST_TYPING_NAMESPACE,
-            dict(init_schema_map(), **{"typing.Any": ANY_SCHEMA}),
+            schema_map_with(**{"typing.Any": ANY_SCHEMA}),
             {"anyOf": [ANY_SCHEMA, {"type": "null"}]},
-        ],
-        [
-            ast.parse("typing.Union[str]").body[0].value,
-            TEST_TYPING_NAMESPACE,
-            init_schema_map(),
-            InvalidTypeAnnotation("Union cannot have a single element"),
-        ],
-        [
-            ast.parse("typing.Dict[int, str]").body[0].value,
+            id="optional_any",
+        ),
+        pytest.param(
+            parse_expression_cached("typing.Dict[str, int]"),
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
-            InvalidTypeAnnotation("typing.Dict keys must be strings"),
-        ],
-        [
-            ast.parse("typing.Dict[str, int]").body[0].value,
-            TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             {"type": "object", "additionalProperties": {"type": "integer"}},
-        ],
-        [
-            ast.parse("typing.Union[int, str]").body[0].value,
+            id="dict",
+        ),
+        pytest.param(
+            parse_expression_cached("typing.Union[int, str]"),
             TEST_TYPING_NAMESPACE,
-            init_schema_map(),
+            schema_map_with(),
             {"anyOf": [{"type": "integer"}, {"type": "string"}]},
-        ],
-        [
-            ast.parse("eval(35)").body[0].value,
-            TEST_TYPING_NAMESPACE,
-            init_schema_map(),
-            InvalidTypeAnnotation("Unknown type annotation ast element '<class '_ast.Call'>'"),
-        ],
-    ],
-    ids=[
-        "null",
-        "base",
-        "base_not_found",
-        "subscript_missing_import",
-        "subscript_missing_typing",
-        "list",
-        "optional",
-        "optional_any",
-        "bad_union",
-        "dict_bad_keys",
-        "dict",
-        "union",
-        "unsupported",
+            id="union",
+        ),
     ],
 )
 def test_get_json_schema_from_ast_element(ast_element, type_namespace, schema_map, expected):
-    assert_expected(
-        functools.partial(get_json_schema_from_ast_element, ast_element, type_namespace, schema_map), expected
-    )
+    assert get_json_schema_from_ast_element(ast_element, type_namespace, schema_map) == expected
+
+
+@pytest.mark.parametrize(
+    "ast_element, type_namespace, schema_map, expected_message",
+    [
+        pytest.param(
+            parse_expression_cached("complex"),
+            TEST_TYPING_NAMESPACE,
+            schema_map_with(),
+            "Type 'complex' is invalid. Base types and the ones you have imported are bool, int, float, str. "
+            "Did you miss an import?",
+            id="base_not_found",
+        ),
+        pytest.param(
+            parse_expression_cached("Union[str, int]"),
+            TEST_TYPING_NAMESPACE,
+            schema_map_with(),
+            "Type 'Union' is invalid. You have imported typing.Dict, typing.List, typing.Optional, "
+            "typing.Union, and we allow Dict, List, Optional, Union. Did you miss an import?",
+            id="subscript_missing_import",
+        ),
+        pytest.param(
+            parse_expression_cached("typing.Union[str, int]"),
+            {},
+            schema_map_with(),
+            "Type 'typing.Union' is invalid, but no valid types were found. Did you forget importing typing?",
+            id="subscript_missing_typing",
+        ),
+        pytest.param(
+            parse_expression_cached("typing.Union[str]"),
+            TEST_TYPING_NAMESPACE,
+            schema_map_with(),
+            "Union cannot have a single element",
+            id="bad_union",
+        ),
+        pytest.param(
+            parse_expression_cached("typing.Dict[int, str]"),
+            TEST_TYPING_NAMESPACE,
+            schema_map_with(),
+            "typing.Dict keys must be strings",
+            id="dict_bad_keys",
+        ),
+        pytest.param(
+            parse_expression_cached("eval(35)"),
+            TEST_TYPING_NAMESPACE,
+            schema_map_with(),
+            "Unknown type annotation ast element '<class '_ast.Call'>'",
+            id="unsupported",
+        ),
+    ],
+)
+def test_get_json_schema_from_ast_element_invalid(ast_element, type_namespace, schema_map, expected_message):
+    with pytest.raises(InvalidTypeAnnotation) as exception:
+        get_json_schema_from_ast_element(ast_element, type_namespace, schema_map)
+    assert str(exception.value) == expected_message
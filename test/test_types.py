@@ -1,10 +1,11 @@
-import ast
+import collections
 import os
-import tempfile
+import pathlib
 
 import pytest
 
 from pytojsonschema.common import init_typing_namespace, init_schema_map
+from pytojsonschema import types
 from pytojsonschema.types import (
     ANY_SCHEMA,
     process_alias,
@@ -14,14 +15,15 @@ from pytojsonschema.types import (
     process_class_def,
 )
 
+from .conftest import parse_cached, schema_map_with, typing_namespace_with
+
 
 @pytest.mark.parametrize(
     "alias_object, expected",
     [
-        [ast.parse("import typing as foo").body[0].names[0], "foo"],
-        [ast.parse("import typing").body[0].names[0], "typing"],
+        pytest.param(parse_cached("import typing as foo").body[0].names[0], "foo", id="alias"),
+        pytest.param(parse_cached("import typing").body[0].names[0], "typing", id="no_alias"),
     ],
-    ids=["alias", "no_alias"],
 )
 def test_process_alias(alias_object, expected):
     assert process_alias(alias_object) == expected
@@ -30,8 +32,8 @@ def test_process_alias(alias_object, expected):
 @pytest.mark.parametrize(
     "ast_import, expected",
     [
-        [
-            ast.parse("import typing as foo").body[0],
+        pytest.param(
+            parse_cached("import typing as foo").body[0],
             (
                 {
                     "Union": {"foo.Union"},
@@ -42,8 +44,7 @@ def test_process_alias(alias_object, expected):
                     "TypedDict": {"foo.TypedDict"},
                     "Enum": set(),
                 },
-                dict(
-                    init_schema_map(),
+                schema_map_with(
                     **{
                         "foo.Any": {
                             "anyOf": [
@@ -59,9 +60,10 @@ def test_process_alias(alias_object, expected):
                     },
                 ),
             ),
-        ],
-        [
-            ast.parse("import enum").body[0],
+            id="typing",
+        ),
+        pytest.param(
+            parse_cached("import enum").body[0],
             (
                 {
                     "Union": set(),
@@ -72,11 +74,12 @@ def test_process_alias(alias_object, expected):
                     "TypedDict": set(),
                     "Enum": {"enum.Enum"},
                 },
-                init_schema_map(),
+                schema_map_with(),
             ),
-        ],
-        [
-            ast.parse("import os").body[0],
+            id="enum",
+        ),
+        pytest.param(
+            parse_cached("import os").body[0],
             (
                 {
                     "Union": set(),
@@ -87,31 +90,43 @@ def test_process_alias(alias_object, expected):
                     "TypedDict": set(),
                     "Enum": set(),
                 },
-                init_schema_map(),
+                schema_map_with(),
             ),
-        ],
+            id="no_typing_nor_enum",
+        ),
     ],
-    ids=["typing", "enum", "no_typing_nor_enum"],
 )
-def test_process_import(ast_import, expected):
-    type_namespace, schema_map = init_typing_namespace(), init_schema_map()
+def test_process_import(ast_import, expected, fresh_state):
+    type_namespace, schema_map = fresh_state
     process_import(ast_import, type_namespace, schema_map)
-    assert expected[0] == type_namespace
-    assert expected[1] == schema_map
+    assert expected == (type_namespace, schema_map)
 
 
 @pytest.mark.parametrize(
     "ast_assign, type_namespace, schema_map, expected",
     [
-        [
-            ast.parse("a = typing.Optional[str]").body[0],
-            dict(init_typing_namespace(), **{"Optional": {"typing.Optional"}}),
-            init_schema_map(),
-            dict(init_schema_map(), **{"a": {"anyOf": [{"type": "string"}, {"type": "null"}]}}),
-        ],
-        [ast.parse("a = b[34]").body[0], init_typing_namespace(), init_schema_map(), init_schema_map()],
+        pytest.param(
+            parse_cached("a = typing.Optional[str]").body[0],
+            typing_namespace_with(Optional={"typing.Optional"}),
+            schema_map_with(),
+            schema_map_with(a={"anyOf": [{"type": "string"}, {"type": "null"}]}),
+            id="processed",
+        ),
+        pytest.param(
+            parse_cached("a = b[34]").body[0],
+            typing_namespace_with(),
+            schema_map_with(),
+            schema_map_with(),
+            id="not_processed",
+        ),
+        pytest.param(
+            parse_cached("a = b()[34]").body[0],
+            typing_namespace_with(),
+            schema_map_with(),
+            schema_map_with(),
+            id="not_processed_not_a_name",
+        ),
     ],
-    ids=["processed", "not_processed"],
 )
 def test_process_assign(ast_assign, type_namespace, schema_map, expected):
     process_assign(ast_assign, type_namespace, schema_map)
@@ -121,31 +136,41 @@ def test_process_assign(ast_assign, type_namespace, schema_map, expected):
 @pytest.mark.parametrize(
     "ast_class_def, type_namespace, schema_map, expected",
     [
-        [ast.parse("class Foo: pass").body[0], init_typing_namespace(), init_schema_map(), init_schema_map()],
-        [ast.parse("class Foo(bar): pass").body[0], init_typing_namespace(), init_schema_map(), init_schema_map()],
-        [
-            ast.parse(
+        pytest.param(
+            parse_cached("class Foo: pass").body[0],
+            typing_namespace_with(),
+            schema_map_with(),
+            schema_map_with(),
+            id="not_typed_dict_nor_enum",
+        ),
+        pytest.param(
+            parse_cached("class Foo(bar): pass").body[0],
+            typing_namespace_with(),
+            schema_map_with(),
+            schema_map_with(),
+            id="not_typed_dict_nor_enum_with_base_class",
+        ),
+        pytest.param(
+            parse_cached(
                 """class Car(typing.TypedDict):
     '''Some docstring'''
     model: str = "Ford"
     plate: str"""
             ).body[0],
-            dict(init_typing_namespace(), **{"TypedDict": {"typing.TypedDict"}}),
-            init_schema_map(),
-            dict(
-                init_schema_map(),
-                **{
-                    "Car": {
-                        "additionalProperties": False,
-                        "properties": {"model": {"type": "string"}, "plate": {"type": "string"}},
-                        "required": ["plate"],
-                        "type": "object",
-                    }
-                },
+            typing_namespace_with(TypedDict={"typing.TypedDict"}),
+            schema_map_with(),
+            schema_map_with(
+                Car={
+                    "additionalProperties": False,
+                    "properties": {"model": {"type": "string"}, "plate": {"type": "string"}},
+                    "required": ["plate"],
+                    "type": "object",
+                }
             ),
-        ],
-        [
-            ast.parse(
+            id="typed_dict",
+        ),
+        pytest.param(
+            parse_cached(
                 """class Color(enum.Enum):
     '''Some docstring'''
     red = 'red'
@@ -155,26 +180,24 @@ def test_process_assign(ast_assign, type_namespace, schema_map, expected):
     purple = True
     black = None"""
             ).body[0],
-            dict(init_typing_namespace(), **{"Enum": {"enum.Enum"}}),
-            init_schema_map(),
-            dict(
-                init_schema_map(),
-                **{"Color": {"enum": ["red", "blue", 3, 3.14, True, None]}},
-            ),
-        ],
-        [
-            ast.parse(
+            typing_namespace_with(Enum={"enum.Enum"}),
+            schema_map_with(),
+            schema_map_with(Color={"enum": ["red", "blue", 3, 3.14, True, None]}),
+            id="enum",
+        ),
+        pytest.param(
+            parse_cached(
                 """class Number(enum.Enum):
     '''Some docstring'''
     three = 3
     four = eval"""
             ).body[0],
-            dict(init_typing_namespace(), **{"Enum": {"enum.Enum"}}),
-            init_schema_map(),
-            init_schema_map(),
-        ],
+            typing_namespace_with(Enum={"enum.Enum"}),
+            schema_map_with(),
+            schema_map_with(),
+            id="enum_bad_types",
+        ),
     ],
-    ids=["not_typed_dict_nor_enum", "not_typed_dict_nor_enum_with_base_class", "typed_dict", "enum", "enum_bad_types"],
 )
 def test_process_class_def(ast_class_def, type_namespace, schema_map, expected):
     process_class_def(ast_class_def, type_namespace, schema_map)
@@ -184,123 +207,180 @@ def test_process_class_def(ast_class_def, type_namespace, schema_map, expected):
 @pytest.mark.parametrize(
     "ast_import_from, base_path, expected",
     [
-        [
-            ast.parse("from typing import Any").body[0],
+        pytest.param(
+            parse_cached("from typing import Any").body[0],
+            ".",
+            (typing_namespace_with(Any={"Any"}), schema_map_with(Any=ANY_SCHEMA)),
+            id="typing_any",
+        ),
+        pytest.param(
+            parse_cached("from enum import Enum").body[0],
             ".",
-            (dict(init_typing_namespace(), **{"Any": {"Any"}}), dict(init_schema_map(), **{"Any": ANY_SCHEMA})),
-        ],
-        [
-            ast.parse("from enum import Enum").body[0],
+            (typing_namespace_with(Enum={"Enum"}), schema_map_with()),
+            id="enum_enum",
+        ),
+        pytest.param(
+            parse_cached("from typing import Union").body[0],
             ".",
-            (dict(init_typing_namespace(), **{"Enum": {"Enum"}}), init_schema_map()),
-        ],
-        [
-            ast.parse("from typing import Union").body[0],
+            (typing_namespace_with(Union={"Union"}), schema_map_with()),
+            id="typing_union",
+        ),
+        pytest.param(
+            parse_cached("from enum import foo").body[0],
             ".",
-            (dict(init_typing_namespace(), **{"Union": {"Union"}}), init_schema_map()),
-        ],
-        [ast.parse("from enum import foo").body[0], ".", (init_typing_namespace(), init_schema_map())],
-        [ast.parse("from typing import foo").body[0], ".", (init_typing_namespace(), init_schema_map())],
-        [ast.parse("from os import path").body[0], ".", (init_typing_namespace(), init_schema_map())],
+            (typing_namespace_with(), schema_map_with()),
+            id="else_typing",
+        ),
+        pytest.param(
+            parse_cached("from typing import foo").body[0],
+            ".",
+            (typing_namespace_with(), schema_map_with()),
+            id="else_enum",
+        ),
+        pytest.param(
+            parse_cached("from os import path").body[0],
+            ".",
+            (typing_namespace_with(), schema_map_with()),
+            id="else_no_typing_nor_enum",
+        ),
     ],
-    ids=["typing_any", "enum_enum", "typing_union", "else_typing", "else_enum", "else_no_typing_nor_enum"],
 )
-def test_process_import_from_external(ast_import_from, base_path, expected):
-    type_namespace, schema_map = init_typing_namespace(), init_schema_map()
+def test_process_import_from_external(ast_import_from, base_path, expected, fresh_state):
+    type_namespace, schema_map = fresh_state
     process_import_from(ast_import_from, base_path, type_namespace, schema_map)
-    assert expected[0] == type_namespace
-    assert expected[1] == schema_map
+    assert expected == (type_namespace, schema_map)
+
+
+@pytest.fixture(scope="session")
+def local_package(tmp_path_factory):
+    # Package creation. Returns the package and subpackage paths, and the bodies of the modules that import others
+    package = tmp_path_factory.mktemp("package")
+    subpackage = package / "subpackage"
+    subpackage.mkdir()
+    package_init_content = "import typing\n\nfrom .foo import B\n\n\nclass A(typing.TypedDict):\n    param: B\n"
+    subpackage_bar_content = (
+        "from .. import A\nfrom ..foo import B\nfrom . import C\nfrom .baz import D\nfrom .baz import bad\n"
+    )
+    (package / "__init__.py").write_text(package_init_content)
+    (package / "foo.py").write_text("import typing\n\n\nclass B(typing.TypedDict):\n    param: int\n")
+    (subpackage / "__init__.py").write_text(
+        "import typing\n\n\nC = typing.Union[bool, float]\n\n\neval(3)\na, b = 1, 2\n"
+    )
+    (subpackage / "bar.py").write_text(subpackage_bar_content)
+    (subpackage / "baz.py").write_text("import typing\n\n\nD = typing.Dict[str, int]\n")
+    return (
+        str(package),
+        str(subpackage),
+        parse_cached(package_init_content).body,
+        parse_cached(subpackage_bar_content).body,
+    )
+
+
+_LOCAL_B_SCHEMA = {
+    "type": "object",
+    "properties": {"param": {"type": "integer"}},
+    "required": ["param"],
+    "additionalProperties": False,
+}
+
+
+@pytest.mark.parametrize(
+    "from_subpackage, statement_index, expected",
+    [
+        pytest.param(False, 1, schema_map_with(B=_LOCAL_B_SCHEMA), id="same_level"),
+        pytest.param(
+            True,
+            0,
+            schema_map_with(
+                A={
+                    "type": "object",
+                    "properties": {"param": _LOCAL_B_SCHEMA},
+                    "required": ["param"],
+                    "additionalProperties": False,
+                },
+            ),
+            id="parent_init",
+        ),
+        pytest.param(True, 1, schema_map_with(B=_LOCAL_B_SCHEMA), id="parent_module"),
+        pytest.param(
+            True, 2, schema_map_with(C={"anyOf": [{"type": "boolean"}, {"type": "number"}]}), id="current_init"
+        ),
+        pytest.param(
+            True,
+            3,
+            schema_map_with(D={"additionalProperties": {"type": "integer"}, "type": "object"}),
+            id="current_module",
+        ),
+        pytest.param(True, 4, schema_map_with(), id="not_a_type"),
+    ],
+)
+def test_process_import_from_local(local_package, from_subpackage, statement_index, expected):
+    package, subpackage, package_init_body, subpackage_bar_body = local_package
+    if from_subpackage:
+        ast_import_from, base_path = subpackage_bar_body[statement_index], subpackage
+    else:
+        ast_import_from, base_path = package_init_body[statement_index], package
+    schema_map = init_schema_map()
+    process_import_from(ast_import_from, base_path, init_typing_namespace(), schema_map)
+    assert schema_map == expected
+
+
+def test_process_import_from_local_changes(tmp_path):
+    package_foo = tmp_path / "foo.py"
+    package_bar = tmp_path / "bar.py"
+    (tmp_path / "__init__.py").write_text("from .foo import B\n")
+    package_foo.write_text(
+        "from typing import TypedDict\n\nfrom .bar import C\n\n\nclass B(TypedDict):\n    param: C\n"
+    )
+    package_bar.write_text("import typing\n\n\nC = typing.List[int]\n")
+    ast_import_from = parse_cached("from .foo import B").body[0]
+
+    def _get_b_schema() -> dict:
+        schema_map = init_schema_map()
+        process_import_from(ast_import_from, str(tmp_path), init_typing_namespace(), schema_map)
+        return schema_map["B"]
+
+    def _bump_mtime(path: pathlib.Path):
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+    assert _get_b_schema()["properties"]["param"] == {"type": "array", "items": {"type": "integer"}}
+    cached = types._MODULE_SCHEMA_MAP_CACHE[str(package_foo)]
+    assert _get_b_schema()["properties"]["param"] == {"type": "array", "items": {"type": "integer"}}
+    assert types._MODULE_SCHEMA_MAP_CACHE[str(package_foo)] is cached  # Nothing changed
+    # A change in a module the imported one depends on
+    package_bar.write_text("import typing\n\n\nC = typing.List[str]\n")
+    _bump_mtime(package_bar)
+    assert _get_b_schema()["properties"]["param"] == {"type": "array", "items": {"type": "string"}}
+    # The dependency is removed
+    package_foo.write_text("import typing\n\n\nclass B(typing.TypedDict):\n    param: bool\n")
+    _bump_mtime(package_foo)
+    package_bar.unlink()
+    assert _get_b_schema()["properties"]["param"] == {"type": "boolean"}
+
+
+def test_process_import_from_local_copies(tmp_path):
+    (tmp_path / "foo.py").write_text("import typing\n\n\nclass B(typing.TypedDict):\n    param: int\n")
+    ast_import_from = parse_cached("from .foo import B").body[0]
+    schema_map = init_schema_map()
+    process_import_from(ast_import_from, str(tmp_path), init_typing_namespace(), schema_map)
+    schema_map["B"]["description"] = "mine"
+    schema_map["B"]["properties"]["param"]["minimum"] = 0
+    schema_map = init_schema_map()
+    process_import_from(ast_import_from, str(tmp_path), init_typing_namespace(), schema_map)
+    assert schema_map["B"] == {
+        "type": "object",
+        "properties": {"param": {"type": "integer"}},
+        "required": ["param"],
+        "additionalProperties": False,
+    }
 
 
-def test_process_import_from_local():
-    with tempfile.TemporaryDirectory() as package:
-        # Package creation
-        subpackage = os.path.join(package, "subpackage")
-        os.mkdir(subpackage)
-        package_init = os.path.join(package, "__init__.py")
-        package_foo = os.path.join(package, "foo.py")
-        subpackage_init = os.path.join(subpackage, "__init__.py")
-        subpackage_bar = os.path.join(subpackage, "bar.py")
-        subpackage_baz = os.path.join(subpackage, "baz.py")
-        with open(package_init, "w") as f:
-            f.write("import typing\n\nfrom .foo import B\n\n\nclass A(typing.TypedDict):\n    param: B\n")
-        with open(package_foo, "w") as f:
-            f.write("import typing\n\n\nclass B(typing.TypedDict):\n    param: int\n")
-        with open(subpackage_init, "w") as f:
-            f.write("import typing\n\n\nC = typing.Union[bool, float]\n\n\neval(3)")
-        with open(subpackage_bar, "w") as f:
-            f.write(
-                "from .. import A\nfrom ..foo import B\nfrom . import C\nfrom .baz import D\nfrom .baz import bad\n"
-            )
-        with open(subpackage_baz, "w") as f:
-            f.write("import typing\n\n\nD = typing.Dict[str, int]\n")
-        # Tests
-        type_namespace = init_typing_namespace()
-        b_schema = {
-            "type": "object",
-            "properties": {"param": {"type": "integer"}},
-            "required": ["param"],
-            "additionalProperties": False,
-        }
-        a_schema = {
-            "type": "object",
-            "properties": {"param": b_schema},
-            "required": ["param"],
-            "additionalProperties": False,
-        }
-        with open(package_init) as f:
-            schema_map = init_schema_map()
-            process_import_from(ast.parse(f.read()).body[1], package, type_namespace, schema_map)
-            assert schema_map == {
-                "bool": {"type": "boolean"},
-                "int": {"type": "integer"},
-                "float": {"type": "number"},
-                "str": {"type": "string"},
-                "B": b_schema,
-            }
-        with open(subpackage_bar) as f:
-            file_content = f.read()
-            schema_map = init_schema_map()
-            process_import_from(ast.parse(file_content).body[0], subpackage, type_namespace, schema_map)
-            assert schema_map == {
-                "bool": {"type": "boolean"},
-                "int": {"type": "integer"},
-                "float": {"type": "number"},
-                "str": {"type": "string"},
-                "A": a_schema,
-            }
-            schema_map = init_schema_map()
-            process_import_from(ast.parse(file_content).body[1], subpackage, type_namespace, schema_map)
-            assert schema_map == {
-                "bool": {"type": "boolean"},
-                "int": {"type": "integer"},
-                "float": {"type": "number"},
-                "str": {"type": "string"},
-                "B": b_schema,
-            }
-            schema_map = init_schema_map()
-            process_import_from(ast.parse(file_content).body[2], subpackage, type_namespace, schema_map)
-            assert schema_map == {
-                "bool": {"type": "boolean"},
-                "int": {"type": "integer"},
-                "float": {"type": "number"},
-                "str": {"type": "string"},
-                "C": {"anyOf": [{"type": "boolean"}, {"type": "number"}]},
-            }
-            schema_map = init_schema_map()
-            process_import_from(ast.parse(file_content).body[3], subpackage, type_namespace, schema_map)
-            assert schema_map == {
-                "bool": {"type": "boolean"},
-                "int": {"type": "integer"},
-                "float": {"type": "number"},
-                "str": {"type": "string"},
-                "D": {"additionalProperties": {"type": "integer"}, "type": "object"},
-            }
-            schema_map = init_schema_map()
-            process_import_from(ast.parse(file_content).body[4], subpackage, type_namespace, schema_map)
-            assert schema_map == {
-                "bool": {"type": "boolean"},
-                "int": {"type": "integer"},
-                "float": {"type": "number"},
-                "str": {"type": "string"},
-            }
+def test_process_import_from_local_cache_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(types, "_MODULE_SCHEMA_MAP_CACHE", collections.OrderedDict())
+    monkeypatch.setattr(types, "_MODULE_SCHEMA_MAP_CACHE_SIZE", 1)
+    (tmp_path / "foo.py").write_text("import typing\n\n\nA = typing.List[int]\n")
+    (tmp_path / "bar.py").write_text("import typing\n\n\nB = typing.List[str]\n")
+    for source in ("from .foo import A", "from .bar import B"):
+        process_import_from(parse_cached(source).body[0], str(tmp_path), init_typing_namespace(), init_schema_map())
+    assert str(tmp_path / "foo.py") not in types._MODULE_SCHEMA_MAP_CACHE
+    assert str(tmp_path / "bar.py") in types._MODULE_SCHEMA_MAP_CACHE